@@ -1,19 +1,35 @@
+import os
+import io
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import shap
-import xgboost as xgb
+from joblib import Parallel, delayed
+
+# Intel Extension for Scikit-learn (optional): swaps SVC, KNN, StandardScaler etc.
+# for oneDAL-accelerated versions. Must run before any sklearn import.
+# Streamlit re-runs this script on every interaction, so only patch once per process.
+try:
+    from sklearnex import patch_sklearn, sklearn_is_patched
+    if not sklearn_is_patched():
+        patch_sklearn(verbose=False)
+    USE_ONEDAL = True
+except ImportError:
+    USE_ONEDAL = False
 
 # Scikit-learn imports
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 from sklearn.svm import SVC
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.ensemble import AdaBoostClassifier
-from xgboost import XGBClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+# Local modules
+from naive_bayes import FastGaussianNB
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="Earnings Manipulator Detector", layout="wide")
@@ -27,7 +43,8 @@ This app detects potential earnings manipulation using the **Beneish M-Score var
 @st.cache_data
 def load_data(file):
     try:
-        return pd.read_excel(file)
+        # Rust-based calamine parser is much faster than the default openpyxl engine
+        return pd.read_excel(file, engine='calamine')
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
@@ -38,17 +55,204 @@ uploaded_file = st.sidebar.file_uploader("Upload 'Earnings Manipulator.xlsx'", t
 
 # --- HELPER FUNCTIONS ---
 def evaluate_model(model, X_test, y_test):
-    y_pred = model.predict(X_test)
-    y_prob = model.predict_proba(X_test)[:, 1] if hasattr(model, "predict_proba") else [0]*len(y_pred)
+    # Single inference pass; all metrics derive from one continuous score.
+    # Models without predict_proba (SVC without Platt scaling) use decision_function,
+    # whose class boundary is 0; AUC is rank-based so raw margins work as-is.
+    # Numba kernels are imported here so numba/LLVM stay off the cold-start path
+    from model_metrics import confusion_counts, rank_auc
+
+    if hasattr(model, "predict_proba"):
+        y_score, threshold = model.predict_proba(X_test)[:, 1], 0.5
+    else:
+        y_score, threshold = model.decision_function(X_test), 0.0
+    # Keep full float64 precision: a narrower cast creates artificial ties for rank_auc
+    y_score = np.ascontiguousarray(y_score, dtype=np.float64)
+    y_true = np.asarray(y_test, dtype=np.int8)
+    tp, fp, fn, tn = confusion_counts(y_true, y_score, threshold)
     
+    # Zero denominators score 0, matching sklearn's zero_division=0
     return {
-        "Accuracy": accuracy_score(y_test, y_pred),
-        "Precision": precision_score(y_test, y_pred, zero_division=0),
-        "Recall": recall_score(y_test, y_pred, zero_division=0),
-        "F1 Score": f1_score(y_test, y_pred, zero_division=0),
-        "ROC AUC": roc_auc_score(y_test, y_prob) if len(set(y_test)) > 1 else 0
+        "Accuracy": (tp + tn) / len(y_true),
+        "Precision": tp / (tp + fp) if tp + fp else 0.0,
+        "Recall": tp / (tp + fn) if tp + fn else 0.0,
+        "F1 Score": 2 * tp / (2 * tp + fp + fn) if tp else 0.0,
+        "ROC AUC": rank_auc(y_true, y_score)
     }
 
+@st.cache_data
+def prepare_splits(df, feature_cols, target_col, test_size):
+    # Contiguous float64 features / int8 labels: convert the DataFrame once instead of on every fit.
+    # float64 is what SVC, KNN and HistGradientBoosting validate to, so no per-fit copy is needed.
+    X = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float64))
+    # Map 'Yes'/'No' to 1/0 if necessary
+    if not pd.api.types.is_numeric_dtype(df[target_col]):
+        y = df[target_col].map({'No': 0, 'Yes': 1})
+    else:
+        y = df[target_col]
+    y = np.asarray(y, dtype=np.int8)
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42, stratify=y)
+
+    scaler = StandardScaler().fit(X_train)
+    return X_train, X_test, y_train, y_test, scaler.transform(X_train), scaler.transform(X_test)
+
+# xgboost, skopt, shap and matplotlib are imported only on the code paths that use them,
+# keeping them off the cold-start path of every page load
+def _xgb_classifier():
+    from xgboost import XGBClassifier
+    # n_jobs=1: models are fitted in parallel processes, avoid nested threads
+    return XGBClassifier(eval_metric='logloss', tree_method='hist', device='cpu', n_jobs=1, random_state=42)
+
+# Baseline models, keyed by display name
+MODEL_FACTORIES = {
+    "SVM": lambda: SVC(kernel='rbf'),
+    # 8 features suit a k-d tree; oneDAL's vectorised brute force is faster when patched in
+    "KNN": lambda: KNeighborsClassifier(n_neighbors=5, algorithm='brute' if USE_ONEDAL else 'kd_tree',
+                                        leaf_size=16),
+    "Naive Bayes": lambda: FastGaussianNB(),
+    "HistGradientBoosting": lambda: HistGradientBoostingClassifier(max_iter=200, learning_rate=0.05, max_depth=4,
+                                                                   random_state=42),
+    "XGBoost": _xgb_classifier
+}
+
+def _fit(clf, X_train, y_train):
+    return clf.fit(X_train, y_train)
+
+@st.cache_resource
+def train_models(data_for_model, y_train):
+    # Fit every baseline model concurrently, one worker per model (capped at core count).
+    # Fitted estimators are kept across reruns, keyed on the training data.
+    n_jobs = min(len(MODEL_FACTORIES), os.cpu_count() or 1)
+    fitted = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_fit)(factory(), data_for_model[name][0], y_train)
+        for name, factory in MODEL_FACTORIES.items()
+    )
+    return dict(zip(MODEL_FACTORIES, fitted))
+
+# XGBoost tuning: Bayesian search space and fixed booster parameters
+def xgb_search_space():
+    from skopt.space import Integer, Real
+
+    return [
+        Integer(50, 400, name='n_estimators'),
+        Real(0.01, 0.3, prior='log-uniform', name='learning_rate'),
+        Integer(3, 8, name='max_depth'),
+        Real(0.1, 2, prior='log-uniform', name='min_child_weight'),
+        Real(0.6, 1.0, name='subsample'),
+        Real(0.6, 1.0, name='colsample_bytree')
+    ]
+
+XGB_BASE_PARAMS = {'objective': 'binary:logistic', 'eval_metric': 'auc', 'tree_method': 'hist',
+                   'device': 'cpu', 'seed': 42}
+XGB_N_ITER = 16
+
+def tune_xgboost(X_train, y_train, feature_names, n_iter=XGB_N_ITER):
+    import xgboost as xgb
+    from skopt import Optimizer
+
+    search_space = xgb_search_space()
+    # Build the DMatrix once; every xgb.cv call below slices folds from it
+    # instead of re-ingesting the DataFrame per fit.
+    dtrain = xgb.DMatrix(X_train, label=y_train, feature_names=feature_names)
+    # Stratify once and reuse the same fold indices for every candidate
+    cv_splits = list(StratifiedKFold(n_splits=3, shuffle=True, random_state=42).split(X_train, y_train))
+    optimizer = Optimizer(search_space, random_state=42)
+
+    best_auc, best_params, best_rounds = -np.inf, None, None
+    for _ in range(n_iter):
+        point = optimizer.ask()
+        params = {dim.name: value for dim, value in zip(search_space, point)}
+        n_estimators = int(params.pop('n_estimators'))
+        params['max_depth'] = int(params['max_depth'])
+
+        cv_results = xgb.cv({**XGB_BASE_PARAMS, **params}, dtrain, num_boost_round=n_estimators,
+                            folds=cv_splits, early_stopping_rounds=20, seed=42)
+        # With early stopping the history is truncated at the best round
+        auc = cv_results['test-auc-mean'].iloc[-1]
+        optimizer.tell(point, -auc)
+
+        if auc > best_auc:
+            best_auc, best_params, best_rounds = auc, params, len(cv_results)
+
+    booster = xgb.train({**XGB_BASE_PARAMS, **best_params}, dtrain, num_boost_round=best_rounds)
+    return booster, {**best_params, 'n_estimators': best_rounds}, best_auc
+
+# Tuned booster persisted in XGBoost's native UBJSON format so tuning survives restarts
+TUNED_MODEL_PATH = Path(__file__).parent / "cache" / "best_xgb.ubj"
+
+def tuning_fingerprint(X_train, y_train):
+    # Identifies the training split and the tuning setup; changing either invalidates the saved model
+    config = json.dumps({
+        'base_params': XGB_BASE_PARAMS,
+        'search_space': [f"{dim.name}={dim!r}" for dim in xgb_search_space()],
+        'n_iter': XGB_N_ITER
+    }, sort_keys=True)
+    return hashlib.sha1(X_train.tobytes() + y_train.tobytes() + config.encode()).hexdigest()
+
+def save_tuned_model(booster, best_params, best_auc, tuning_key):
+    # Tuning results travel inside the model file as booster attributes
+    booster.set_attr(best_params=json.dumps(best_params), cv_auc=str(best_auc), tuning_key=tuning_key)
+    TUNED_MODEL_PATH.parent.mkdir(exist_ok=True)
+    # Write to a temp file and swap it in atomically so concurrent sessions never see a partial file
+    fd, tmp_path = tempfile.mkstemp(suffix=TUNED_MODEL_PATH.suffix, dir=TUNED_MODEL_PATH.parent)
+    os.close(fd)
+    try:
+        booster.save_model(tmp_path)
+        os.replace(tmp_path, TUNED_MODEL_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def load_tuned_model():
+    if not TUNED_MODEL_PATH.exists():
+        return None
+    import xgboost as xgb
+    # A corrupt file or one missing the tuning attributes is treated as absent, forcing a re-tune
+    try:
+        booster = xgb.Booster(model_file=str(TUNED_MODEL_PATH))
+        best_params = json.loads(booster.attr('best_params'))
+        best_auc = float(booster.attr('cv_auc'))
+    except (xgb.core.XGBoostError, TypeError, ValueError):
+        return None
+    return booster, best_params, best_auc, booster.attr('tuning_key')
+
+@st.cache_resource
+def compute_shap(_model, model_key, X_train, max_samples=1000):
+    # A beeswarm only needs a representative subsample, not the full training set.
+    # _model is excluded from hashing; model_key identifies it instead.
+    import shap
+
+    sample = X_train.sample(min(max_samples, len(X_train)), random_state=42)
+    explainer = shap.TreeExplainer(_model, feature_perturbation='tree_path_dependent')
+    return sample, explainer.shap_values(sample, approximate=True)
+
+def _encode_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
+
+@st.cache_data
+def render_shap_plots(_shap_values, model_key, shap_sample):
+    # Encoded PNGs are cached so reruns skip both summary_plot calls and rasterisation.
+    # _shap_values is excluded from hashing; it is determined by model_key and the sample.
+    import shap
+    import matplotlib.pyplot as plt
+
+    # summary_plot draws through pyplot's global current figure, so the figures are built in turn
+    figs = []
+    for plot_type in ("bar", "dot"):
+        fig, ax = plt.subplots()
+        shap.summary_plot(_shap_values, shap_sample, plot_type=plot_type, show=False)
+        figs.append(fig)
+
+    # Rendering and encoding only touch each figure's own canvas (matplotlib keeps font objects
+    # per thread), so the two savefig calls run on separate workers on a cache miss
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pngs = tuple(executor.map(_encode_png, figs))
+    for fig in figs:
+        plt.close(fig)
+    return pngs
+
 # --- MAIN APP LOGIC ---
 if uploaded_file is not None:
     df = load_data(uploaded_file)
@@ -65,21 +269,13 @@ if uploaded_file is not None:
         # Check if columns exist
         if all(col in df.columns for col in feature_cols) and target_col in df.columns:
             
-            X = df[feature_cols]
-            # Map 'Yes'/'No' to 1/0 if necessary
-            if df[target_col].dtype == 'object':
-                y = df[target_col].map({'No': 0, 'Yes': 1})
-            else:
-                y = df[target_col]
-
-            # Data Splitting
-            test_size = st.sidebar.slider("Test Set Size", 0.1, 0.5, 0.25)
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42, stratify=y)
-
-            # Scaling
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_test_scaled = scaler.transform(X_test)
+            # Data Splitting & Scaling (cached per dataset and test size).
+            # The form batches slider drags so the split only changes when applied.
+            with st.sidebar.form("split_form"):
+                test_size = st.slider("Test Set Size", 0.1, 0.5, 0.25)
+                st.form_submit_button("Apply split")
+            X_train, X_test, y_train, y_test, X_train_scaled, X_test_scaled = prepare_splits(
+                df, feature_cols, target_col, test_size)
 
             st.success(f"Data processed. Training samples: {len(X_train)}, Test samples: {len(X_test)}")
 
@@ -88,23 +284,18 @@ if uploaded_file is not None:
             
             if st.button("Train & Compare Models"):
                 with st.spinner("Training models..."):
-                    models = {
-                        "SVM": SVC(kernel='rbf', probability=True),
-                        "KNN": KNeighborsClassifier(n_neighbors=5),
-                        "Naive Bayes": GaussianNB(),
-                        "AdaBoost": AdaBoostClassifier(n_estimators=200, learning_rate=0.05, random_state=42),
-                        "XGBoost": XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
-                    }
-
                     results = []
+                    # Use scaled data for SVM/KNN, raw for Trees (optional but good practice)
+                    data_for_model = {
+                        "SVM": (X_train_scaled, X_test_scaled),
+                        "KNN": (X_train_scaled, X_test_scaled),
+                        "Naive Bayes": (X_train, X_test),
+                        "HistGradientBoosting": (X_train, X_test),
+                        "XGBoost": (X_train, X_test)
+                    }
+                    models = train_models(data_for_model, y_train)
                     for name, clf in models.items():
-                        # Use scaled data for SVM/KNN, raw for Trees (optional but good practice)
-                        if name in ["SVM", "KNN"]:
-                            clf.fit(X_train_scaled, y_train)
-                            metrics = evaluate_model(clf, X_test_scaled, y_test)
-                        else:
-                            clf.fit(X_train, y_train)
-                            metrics = evaluate_model(clf, X_test, y_test)
+                        metrics = evaluate_model(clf, data_for_model[name][1], y_test)
                         
                         metrics["Model"] = name
                         results.append(metrics)
@@ -118,39 +309,44 @@ if uploaded_file is not None:
 
             # --- 4. HYPERPARAMETER TUNING (XGBoost) ---
             st.subheader("Advanced: XGBoost Tuning")
-            if st.checkbox("Run Grid Search on XGBoost"):
-                with st.spinner("Tuning XGBoost (this takes time)..."):
-                    param_grid = {
-                        'n_estimators': [100, 200],
-                        'learning_rate': [0.01, 0.1],
-                        'max_depth': [3, 4]
-                    }
-                    
-                    xgb_base = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
-                    grid = GridSearchCV(xgb_base, param_grid, cv=3, scoring='roc_auc')
-                    grid.fit(X_train, y_train)
-                    
-                    st.write("Best Parameters:", grid.best_params_)
-                    
-                    best_xgb = grid.best_estimator_
-                    
-                    # SHAP Analysis on best model
-                    st.markdown("### Feature Importance (SHAP)")
-                    explainer = shap.TreeExplainer(best_xgb)
-                    shap_values = explainer.shap_values(X_train)
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown("**Summary Plot**")
-                        fig1, ax1 = plt.subplots()
-                        shap.summary_plot(shap_values, X_train, plot_type="bar", show=False)
-                        st.pyplot(fig1)
-                    
-                    with col2:
-                        st.markdown("**Beeswarm Plot**")
-                        fig2, ax2 = plt.subplots()
-                        shap.summary_plot(shap_values, X_train, show=False)
-                        st.pyplot(fig2)
+            if st.checkbox("Run Bayesian Search on XGBoost"):
+                # Lazily load a model persisted by a previous server process
+                if "best_model" not in st.session_state:
+                    st.session_state["best_model"] = load_tuned_model()
+
+                tuning_key = tuning_fingerprint(X_train, y_train)
+                tuned = st.session_state["best_model"]
+                # Reuse the persisted model only if it was tuned on this exact split and setup
+                if tuned is None or tuned[3] != tuning_key:
+                    with st.spinner("Tuning XGBoost (this takes time)..."):
+                        best_xgb, best_params, best_auc = tune_xgboost(X_train, y_train, feature_cols)
+                        st.session_state["best_model"] = (best_xgb, best_params, best_auc, tuning_key)
+                        # Persisting is best-effort; the in-memory result still serves this session
+                        try:
+                            save_tuned_model(best_xgb, best_params, best_auc, tuning_key)
+                        except OSError as e:
+                            st.warning(f"Could not save the tuned model to disk: {e}")
+                best_xgb, best_params, best_auc, _ = st.session_state["best_model"]
+
+                st.write("Best Parameters:", best_params)
+                st.write(f"Cross-validated ROC AUC: {best_auc:.3f}")
+                
+                # SHAP Analysis on best model
+                st.markdown("### Feature Importance (SHAP)")
+                # Restore column names so the plots keep their feature labels
+                X_train_df = pd.DataFrame(X_train, columns=feature_cols)
+                model_key = tuple(sorted(best_params.items()))
+                shap_sample, shap_values = compute_shap(best_xgb, model_key, X_train_df)
+                png1, png2 = render_shap_plots(shap_values, model_key, shap_sample)
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Summary Plot**")
+                    st.image(png1)
+                
+                with col2:
+                    st.markdown("**Beeswarm Plot**")
+                    st.image(png2)
 
         else:
             st.error(f"Dataset must contain these columns: {', '.join(feature_cols)} and '{target_col}'")
@@ -0,0 +1,46 @@
+import numpy as np
+from numba import njit
+
+# Numba evaluation kernels, kept out of main.py so numba/LLVM load only when models are scored
+
+@njit(cache=True)
+def confusion_counts(y_true, y_score, threshold=0.5):
+    # Single pass over the test set: TP, FP, FN, TN at the given score threshold
+    tp = fp = fn = tn = 0
+    for i in range(y_true.shape[0]):
+        if y_score[i] >= threshold:
+            if y_true[i]:
+                tp += 1
+            else:
+                fp += 1
+        elif y_true[i]:
+            fn += 1
+        else:
+            tn += 1
+    return tp, fp, fn, tn
+
+@njit(cache=True)
+def rank_auc(y_true, y_score):
+    # ROC AUC via the Mann-Whitney U statistic, with average ranks for tied scores
+    n = y_true.shape[0]
+    order = np.argsort(y_score, kind='mergesort')
+    ranks = np.empty(n, dtype=np.float64)
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and y_score[order[j + 1]] == y_score[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2.0 + 1.0
+        i = j + 1
+
+    n_pos = 0
+    pos_rank_sum = 0.0
+    for i in range(n):
+        if y_true[i]:
+            n_pos += 1
+            pos_rank_sum += ranks[i]
+    n_neg = n - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return 0.0
+    return (pos_rank_sum - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg)
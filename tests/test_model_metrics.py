@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from sklearn.metrics import confusion_matrix, roc_auc_score
+
+from model_metrics import confusion_counts, rank_auc
+
+
+def _random_case(seed, n_levels=None):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(5, 300))
+    y_true = rng.integers(0, 2, n).astype(np.int8)
+    # Coarse score levels force many ties; None gives continuous float64 scores
+    if n_levels:
+        y_score = rng.integers(0, n_levels, n) / n_levels
+    else:
+        y_score = rng.random(n)
+    return y_true, y_score.astype(np.float64)
+
+
+@pytest.mark.parametrize("n_levels", [None, 10, 3])
+def test_confusion_counts_matches_sklearn(n_levels):
+    for seed in range(50):
+        y_true, y_score = _random_case(seed, n_levels)
+        tn, fp, fn, tp = confusion_matrix(y_true, y_score >= 0.5, labels=[0, 1]).ravel()
+        assert confusion_counts(y_true, y_score, 0.5) == (tp, fp, fn, tn)
+
+
+@pytest.mark.parametrize("n_levels", [None, 10, 3])
+def test_rank_auc_matches_sklearn(n_levels):
+    for seed in range(50):
+        y_true, y_score = _random_case(seed, n_levels)
+        if len(set(y_true)) < 2:
+            continue
+        assert rank_auc(y_true, y_score) == pytest.approx(roc_auc_score(y_true, y_score), abs=1e-12)
+
+
+def test_rank_auc_single_class_is_zero():
+    y_true = np.ones(10, dtype=np.int8)
+    assert rank_auc(y_true, np.linspace(0, 1, 10)) == 0.0
+
+
+def test_rank_auc_separates_close_float64_scores():
+    # Scores that differ only beyond float32 precision must not be treated as ties
+    y_true = np.array([0, 1], dtype=np.int8)
+    y_score = np.array([0.5, 0.5 + 1e-12])
+    assert rank_auc(y_true, y_score) == 1.0
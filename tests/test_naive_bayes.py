@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from sklearn.naive_bayes import GaussianNB
+
+from naive_bayes import FastGaussianNB
+
+
+def _random_case(seed):
+    rng = np.random.default_rng(seed)
+    # Features on very different scales exercise the max-variance smoothing term
+    X = rng.normal(size=(400, 8)) * np.arange(1, 9) + rng.normal(size=8)
+    y = (X[:, 0] + rng.normal(size=400) > 0.5).astype(np.int8)
+    X_test = rng.normal(size=(100, 8)) * np.arange(1, 9)
+    return X, y, X_test
+
+
+@pytest.mark.parametrize("var_smoothing", [1e-9, 1e-3, 1.0])
+def test_predict_proba_matches_sklearn(var_smoothing):
+    for seed in range(10):
+        X, y, X_test = _random_case(seed)
+        fast = FastGaussianNB(var_smoothing=var_smoothing).fit(X, y)
+        ref = GaussianNB(var_smoothing=var_smoothing).fit(X, y)
+        np.testing.assert_allclose(fast.var_, ref.var_, rtol=1e-12)
+        np.testing.assert_allclose(fast.predict_proba(X_test), ref.predict_proba(X_test), atol=1e-12)
+        np.testing.assert_array_equal(fast.predict(X_test), ref.predict(X_test))
+
+
+def test_float32_input_matches_sklearn():
+    X, y, X_test = _random_case(0)
+    X, X_test = X.astype(np.float32), X_test.astype(np.float32)
+    fast = FastGaussianNB().fit(X, y)
+    ref = GaussianNB().fit(X, y)
+    np.testing.assert_allclose(fast.predict_proba(X_test), ref.predict_proba(X_test), atol=1e-6)